@@ -15,6 +15,9 @@ import plotly.graph_objects as go
 from datetime import datetime
 import warnings
 import os
+import copy
+import json
+import re
 from scipy.cluster.hierarchy import dendrogram, linkage
 from scipy.spatial.distance import pdist
 import folium
@@ -41,6 +44,18 @@ REGION_COORDS = {
     'Pays de la Loire': [47.2184, -0.5528]
 }
 
+# Strips the leading "Production " from energy column names; the unit suffix stays part of the label
+ENERGY_NAME_PATTERN = re.compile(r'production ', re.IGNORECASE)
+
+# Same coordinates as a lat/lon frame indexed by region, for vectorized joins
+COORDS_DF = pd.DataFrame.from_dict(REGION_COORDS, orient='index', columns=['lat', 'lon'])
+
+# Folium marker color scales: bin edges on normalized production, with one more color than edges
+MARKER_BIN_EDGES = np.array([0.2, 0.4, 0.6, 0.8])
+MARKER_PALETTE = np.array(['#fee5d9', '#fcae91', '#fb6a4a', '#de2d26', '#a50f15'])
+CHOROPLETH_BIN_EDGES = np.array([0.2, 0.4, 0.6, 0.75, 0.9])
+CHOROPLETH_PALETTE = np.array(['#d01c8b', '#f1b6da', '#b8e186', '#4dac26', '#1b7837', '#004529'])
+
 
 # PAGE CONFIG
 
@@ -129,40 +144,90 @@ st.markdown("""
 
 # LOAD AND CACHE DATA
 
+def fingerprint_dataframe(df):
+    """Cheap cache key for a DataFrame: shape, columns, dtypes, totals, category labels and a sampled row hash."""
+    numeric_totals = tuple(df.select_dtypes('number').sum().round(6))
+    category_cols = df.select_dtypes('category').columns
+    category_totals = tuple(int(df[col].cat.codes.sum()) for col in category_cols)
+    category_labels = tuple(tuple(df[col].cat.categories) for col in category_cols)
+    # Totals ignore row order and text columns; hashing every ~64th row (labels included) catches both cheaply
+    sample = df.iloc[::max(1, len(df) // 64)]
+    sample_hash = pd.util.hash_pandas_object(sample, index=True).to_numpy().tobytes()
+    return (df.shape, tuple(df.columns), tuple(map(str, df.dtypes)), numeric_totals,
+            category_totals, category_labels, sample_hash)
+
+# Let Streamlit key cached functions on the fingerprint rather than hashing every cell
+DF_HASH_FUNCS = {pd.DataFrame: fingerprint_dataframe}
+
+@st.cache_resource
+def app_started_at():
+    """Timestamp of the first run in this server process; Streamlit re-executes module code on every rerun."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def empty_figure(message="No data available for the selected filters", height=600):
+    """Placeholder figure returned by chart builders when the filters leave nothing to plot."""
+    fig = go.Figure()
+    fig.add_annotation(
+        text=message,
+        xref="paper", yref="paper",
+        x=0.5, y=0.5, showarrow=False,
+        font=dict(size=16)
+    )
+    fig.update_layout(height=height)
+    return fig
+
+def min_max_scale(values, flat_value=0.0):
+    """Scale an array to [0, 1] in one vectorized pass; flat inputs map to flat_value."""
+    values = np.asarray(values, dtype=float)
+    lo, hi = values.min(), values.max()
+    if hi > lo:
+        return (values - lo) / (hi - lo)
+    return np.full(values.shape, flat_value)
+
 @st.cache_data
 def load_data():
-    """Load renewable energy production data from local CSV file."""
+    """Load renewable energy production data from local CSV file (via a Parquet copy when available)."""
     try:
         # Get the directory where this script is located
         script_dir = os.path.dirname(os.path.abspath(__file__))
         csv_path = os.path.join(script_dir, 'data', 'prod-region-annuelle-enr.csv')
+        parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
         
         # Check if file exists
         if not os.path.exists(csv_path):
             st.error(f"Error: CSV file not found at {csv_path}")
             return None
         
-        # Load the CSV file
+        # Read the Parquet copy if it is up to date with the CSV
+        if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+            try:
+                return pd.read_parquet(parquet_path, engine='pyarrow')
+            except Exception:
+                # Missing pyarrow or a corrupt/truncated copy (ArrowInvalid): drop it and rebuild from the CSV
+                try:
+                    os.remove(parquet_path)
+                except OSError:
+                    pass
+        
+        # Load the CSV file and convert it once for faster cold starts
         df = pd.read_csv(csv_path, sep=';', encoding='utf-8')
+        try:
+            df.to_parquet(parquet_path, engine='pyarrow', compression='zstd', index=False)
+        except Exception:
+            # The Parquet copy is only a cache; the CSV frame is still valid without it
+            pass
         return df
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def clean_and_prepare_data(df):
     """Clean and prepare the data for analysis."""
     if df is None:
         return None
     
-    # Make a copy
-    df = df.copy()
-    
-    # Store GeoJSON data before processing
-    geo_data = df[['Nom INSEE région', 'Géo-shape région', 'Géo-point région']].drop_duplicates()
-    geo_data = geo_data.rename(columns={'Nom INSEE région': 'region'})
-    
-    # Rename columns: Annee -> year, Nom INSEE région -> region
+    # Rename columns (returns a new frame, the cached input is left untouched): Annee -> year, Nom INSEE région -> region
     df = df.rename(columns={
         'Annee': 'year',
         'Nom INSEE région': 'region'
@@ -171,68 +236,183 @@ def clean_and_prepare_data(df):
     # Get energy columns (all columns that contain "Production" and end with "(GWh)")
     energy_columns = [col for col in df.columns if 'Production' in col and '(GWh)' in col]
     
+    # Clean energy type names once per column instead of once per melted row
+    energy_names = {col: ENERGY_NAME_PATTERN.sub('', col).strip() for col in energy_columns}
+    df = df.rename(columns=energy_names)
+    energy_columns = list(energy_names.values())
+    
     # Keep only relevant columns
     id_vars = ['region', 'year']
     df = df[id_vars + energy_columns].copy()
     
+    # Convert production to numeric while the frame is still wide, then GWh to MWh (1 GWh = 1000 MWh)
+    df[energy_columns] = df[energy_columns].apply(pd.to_numeric, errors='coerce') * 1000
+    
+    # Skip energy columns without any data so they are never melted
+    energy_columns = [col for col in energy_columns if df[col].notna().any()]
+    
+    # Ensure year is integer
+    df['year'] = pd.to_numeric(df['year'], errors='coerce').astype(int)
+    
     # Melt the dataframe
     df_melted = df.melt(
         id_vars=id_vars,
         value_vars=energy_columns,
         var_name='energy_type',
-        value_name='production_gwh'
+        value_name='production_mwh',
+        ignore_index=True
     )
     
-    # Clean energy type names
-    df_melted['energy_type'] = df_melted['energy_type'].str.replace('Production ', '', case=False)
-    df_melted['energy_type'] = df_melted['energy_type'].str.replace(' renouvelable \\(GWh\\)', '', case=False)
-    df_melted['energy_type'] = df_melted['energy_type'].str.replace(' \\(GWh\\)', '', case=False)
-    df_melted['energy_type'] = df_melted['energy_type'].str.strip()
-    
-    # Convert production to numeric (GWh)
-    df_melted['production_gwh'] = pd.to_numeric(df_melted['production_gwh'], errors='coerce')
-    
-    # Convert GWh to MWh for consistency (1 GWh = 1000 MWh)
-    df_melted['production_mwh'] = df_melted['production_gwh'] * 1000
-    
     # Remove rows with NaN production values
     df_melted = df_melted.dropna(subset=['production_mwh'])
     
-    # Ensure year is integer
-    df_melted['year'] = pd.to_numeric(df_melted['year'], errors='coerce').astype(int)
-    
-    # Drop the GWh column as we have MWh
-    df_melted = df_melted.drop('production_gwh', axis=1)
+    # Categorical keys make every downstream groupby/isin work on small integer codes;
+    # production stays float64 so summed totals display exactly
+    df_melted = df_melted.astype({
+        'region': 'category',
+        'energy_type': 'category',
+        'year': 'int16'
+    })
     
-    # Store geo_data as a global for later use
-    st.session_state.geo_data = geo_data
+    # Sorted by year so a year range is a contiguous block that apply_filters can slice by position
+    df_melted = df_melted.sort_values(['year', 'region'], ignore_index=True)
     
     return df_melted
 
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def prepare_geo_data(df):
+    """Extract one lat/lon centroid per region from the raw data, parsed once."""
+    if df is None:
+        return None
+    
+    # One row per region; geometry does not change between years
+    geo_data = df[['Nom INSEE région', 'Géo-point région']].drop_duplicates(subset='Nom INSEE région')
+    geo_data = geo_data.rename(columns={'Nom INSEE région': 'region'}).reset_index(drop=True)
+    
+    # Parse centroids from strings like "48.688976812, 5.613113265" in one vectorized pass
+    coords = geo_data['Géo-point région'].str.split(',', n=1, expand=True)
+    geo_data['lat'] = pd.to_numeric(coords[0].str.strip(), errors='coerce')
+    geo_data['lon'] = pd.to_numeric(coords[1].str.strip(), errors='coerce')
+    return geo_data.loc[geo_data['lat'].notna() & geo_data['lon'].notna(), ['region', 'lat', 'lon']]
+
+@st.cache_resource
+def build_region_geojson():
+    """Build the static region FeatureCollection once per process."""
+    df = load_data()
+    features = []
+    if df is not None:
+        # One shape per region; geometry does not change between years
+        shapes = df[['Nom INSEE région', 'Géo-shape région']].drop_duplicates(subset='Nom INSEE région')
+        for region_name, geo_shape in zip(shapes['Nom INSEE région'], shapes['Géo-shape région']):
+            try:
+                geo_json = json.loads(geo_shape) if isinstance(geo_shape, str) else geo_shape
+            except ValueError:
+                continue
+            features.append({
+                "type": "Feature",
+                "properties": {"region": region_name},
+                "geometry": geo_json
+            })
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+# SHARED AGGREGATES
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def apply_filters(df, year_start, year_end, energy_types, regions):
+    """Slice the cleaned data to the selected years, energy types and regions (cached per widget state)."""
+    # The year range is found by binary search instead of a full-column mask, which needs df sorted by year;
+    # clean_and_prepare_data guarantees that, but re-sort rather than return a wrong slice if it ever doesn't
+    if not df['year'].is_monotonic_increasing:
+        df = df.sort_values('year', kind='stable')
+    start = df['year'].searchsorted(year_start, side='left')
+    stop = df['year'].searchsorted(year_end, side='right')
+    window = df.iloc[start:stop]
+    filtered = window[
+        window['energy_type'].isin(energy_types) &
+        window['region'].isin(regions)
+    ]
+    # Plotly Express groups colour/facet columns without observed=True, so categories that were
+    # filtered out must be dropped or every chart fed from this frame raises KeyError
+    return filtered.assign(
+        region=filtered['region'].cat.remove_unused_categories(),
+        energy_type=filtered['energy_type'].cat.remove_unused_categories()
+    )
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def summarize_production(df):
+    """Dataset-wide totals (overall, per year, per region, per energy type) behind the KPIs and insight cards."""
+    # Years are a small dense integer range, so a weighted bincount over year offsets replaces a hash groupby
+    years = df['year'].to_numpy()
+    first_year = years.min()
+    offsets = years - first_year
+    year_totals = np.bincount(offsets, weights=df['production_mwh'].to_numpy())
+    has_rows = np.bincount(offsets) > 0
+    
+    return {
+        'total': df['production_mwh'].sum(),
+        'by_year': pd.Series(year_totals[has_rows], index=np.flatnonzero(has_rows) + first_year),
+        'by_region': df.groupby('region', observed=True, sort=False)['production_mwh'].sum(),
+        'by_energy': df.groupby('energy_type', observed=True, sort=False)['production_mwh'].sum()
+    }
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def aggregate_by_region(df_filtered):
+    """Total production per region for the current filter selection."""
+    return df_filtered.groupby('region', observed=True, sort=False, as_index=False)['production_mwh'].sum()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def aggregate_by_year_region(df_filtered):
+    """Total production per year and region for the current filter selection."""
+    return df_filtered.groupby(['year', 'region'], observed=True, as_index=False)['production_mwh'].sum()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def aggregate_by_year_energy(df_filtered):
+    """Total production per year and energy type for the current filter selection."""
+    return df_filtered.groupby(['year', 'energy_type'], observed=True, as_index=False)['production_mwh'].sum()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def aggregate_by_region_energy(df_filtered):
+    """Total production per region and energy type for the current filter selection."""
+    return df_filtered.groupby(['region', 'energy_type'], observed=True, as_index=False)['production_mwh'].sum()
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def build_energy_hierarchy(region_energy_totals):
+    """Positive region/energy totals with plain string labels, ready for a px sunburst or treemap path."""
+    hierarchy = region_energy_totals[region_energy_totals['production_mwh'] > 0]
+    return hierarchy.astype({'energy_type': str, 'region': str})
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def build_energy_yearly_trends(year_energy_totals):
+    """Year/energy totals ordered by energy type and year, with YoY growth (%) and running total columns."""
+    energy_yearly = year_energy_totals.sort_values(['energy_type', 'year'])
+    
+    # One grouper serves both per-energy series
+    by_energy = energy_yearly.groupby('energy_type', observed=True, sort=False)['production_mwh']
+    energy_yearly['growth_rate'] = by_energy.pct_change() * 100
+    energy_yearly['cumulative'] = by_energy.cumsum()
+    return energy_yearly
+
 
 # ADVANCED VISUALIZATION FUNCTIONS
 
 
-@st.cache_data
+@st.cache_resource(hash_funcs=DF_HASH_FUNCS)
 def create_3d_surface_plot(df_filtered):
     """Create an interactive 3D surface plot showing time x energy type x production."""
-    pivot_data = df_filtered.pivot_table(
-        index='year',
-        columns='energy_type',
-        values='production_mwh',
-        aggfunc='sum',
-        fill_value=0
-    )
+    if df_filtered.empty:
+        return empty_figure()
     
-    years = pivot_data.index.values
-    energy_types = pivot_data.columns.values
-    X, Y = np.meshgrid(range(len(years)), range(len(energy_types)))
-    Z = pivot_data.T.values
+    pivot_data = df_filtered.groupby(
+        ['year', 'energy_type'], observed=True, sort=True
+    )['production_mwh'].sum().unstack(fill_value=0)
     
     fig = go.Figure(data=[go.Surface(
-        x=years[X[0]],
-        y=energy_types[Y[:, 0]],
-        z=Z,
+        x=pivot_data.index,
+        y=pivot_data.columns,
+        z=pivot_data.T.values,
         colorscale='Viridis',
         colorbar=dict(title="Production (MWh)")
     )])
@@ -244,24 +424,26 @@ def create_3d_surface_plot(df_filtered):
             yaxis_title="Energy Type",
             zaxis_title="Production (MWh)"
         ),
-        height=600
+        height=600,
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
-def create_3d_scatter_plot(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_3d_scatter_plot(region_energy_totals):
     """Create interactive 3D scatter plot with region, energy type, and production."""
-    agg_data = df_filtered.groupby(['region', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    if region_energy_totals.empty:
+        return empty_figure()
     
-    # Create numeric indices for categorical variables
-    region_map = {region: i for i, region in enumerate(agg_data['region'].unique())}
-    energy_map = {energy: i for i, energy in enumerate(agg_data['energy_type'].unique())}
+    # Numeric indices come straight from the category codes (unused categories dropped)
+    regions = region_energy_totals['region'].cat.remove_unused_categories()
+    energies = region_energy_totals['energy_type'].cat.remove_unused_categories()
     
-    agg_data['region_idx'] = agg_data['region'].map(region_map)
-    agg_data['energy_idx'] = agg_data['energy_type'].map(energy_map)
+    agg_data = region_energy_totals.assign(
+        region_idx=regions.cat.codes,
+        energy_idx=energies.cat.codes
+    )
     
     fig = go.Figure(data=[go.Scatter3d(
         x=agg_data['region_idx'],
@@ -276,59 +458,98 @@ def create_3d_scatter_plot(df_filtered):
             colorbar=dict(title="Production (MWh)"),
             line=dict(width=0.5, color='white')
         ),
-        text=agg_data.apply(lambda row: f"Region: {row['region']}<br>Energy: {row['energy_type']}<br>Production: {row['production_mwh']:,.0f} MWh", axis=1),
+        text=("Region: " + agg_data['region'].astype(str) +
+              "<br>Energy: " + agg_data['energy_type'].astype(str) +
+              "<br>Production: " + agg_data['production_mwh'].map('{:,.0f}'.format) + " MWh"),
         hoverinfo='text'
     )])
     
     fig.update_layout(
         title="3D Production Analysis: Region x Energy Type x Production",
         scene=dict(
-            xaxis=dict(title="Region", ticktext=list(region_map.keys()), tickvals=list(region_map.values())),
-            yaxis=dict(title="Energy Type", ticktext=list(energy_map.keys()), tickvals=list(energy_map.values())),
+            xaxis=dict(title="Region", ticktext=list(regions.cat.categories),
+                       tickvals=list(range(len(regions.cat.categories)))),
+            yaxis=dict(title="Energy Type", ticktext=list(energies.cat.categories),
+                       tickvals=list(range(len(energies.cat.categories)))),
             zaxis_title="Production (MWh)"
         ),
-        height=600
+        height=600,
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
-def create_animated_bubble_chart(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_animated_bubble_chart(year_region_totals):
     """Create animated bubble chart showing production evolution through years."""
-    agg_data = df_filtered.groupby(['year', 'region']).agg({
-        'production_mwh': 'sum'
-    }).reset_index().sort_values('year')
+    if year_region_totals.empty:
+        return empty_figure()
+    
+    # Already ordered by year: the shared aggregate comes from a sorted groupby
+    agg_data = year_region_totals
     
     # Get the top regions by total production for better visualization
-    top_regions = df_filtered.groupby('region')['production_mwh'].sum().nlargest(10).index.tolist()
+    top_regions = set(agg_data.groupby('region', observed=True)['production_mwh'].sum().nlargest(10).index)
     agg_data_filtered = agg_data[agg_data['region'].isin(top_regions)]
     
     if len(agg_data_filtered) == 0:
         agg_data_filtered = agg_data
     
-    # Create scatter plot with animation
-    fig = px.scatter(
-        agg_data_filtered,
-        x='region',
-        y='production_mwh',
-        size='production_mwh',
-        color='region',
-        animation_frame='year',
-        hover_name='region',
-        hover_data={'production_mwh': ':.0f', 'region': True, 'year': False},
-        title="Bubble Chart: Regional Production Evolution Through Years",
-        labels={'production_mwh': 'Production (MWh)', 'region': 'Region'},
-        size_max=60,
-        color_discrete_sequence=px.colors.qualitative.Set3
+    # One marker trace whose frames swap in each year's points
+    bubble_data = agg_data_filtered.astype({'region': str})
+    regions = bubble_data['region'].unique().tolist()
+    palette = px.colors.qualitative.Set3
+    region_colors = {region: palette[i % len(palette)] for i, region in enumerate(regions)}
+    # Same area scaling Plotly Express applies for size_max=60
+    sizeref = bubble_data['production_mwh'].max() / 60 ** 2
+    
+    def year_points(year_data):
+        return go.Scatter(
+            x=year_data['region'],
+            y=year_data['production_mwh'],
+            marker=dict(size=year_data['production_mwh'], color=year_data['region'].map(region_colors))
+        )
+    
+    per_year = {year: year_data for year, year_data in bubble_data.groupby('year', sort=True)}
+    first_year = next(iter(per_year))
+    
+    fig = go.Figure(
+        data=[year_points(per_year[first_year])],
+        frames=[go.Frame(data=[year_points(year_data)], name=str(year)) for year, year_data in per_year.items()]
+    )
+    fig.update_traces(
+        mode='markers',
+        marker=dict(sizemode='area', sizeref=sizeref, sizemin=0, line=dict(width=0)),
+        hovertemplate='<b>%{x}</b><br>Production (MWh): %{y:.0f}<extra></extra>'
     )
     
     # Update layout for better animation
     fig.update_layout(
+        title="Bubble Chart: Regional Production Evolution Through Years",
+        xaxis=dict(title='Region', categoryorder='array', categoryarray=regions),
+        yaxis_title='Production (MWh)',
         height=600,
         xaxis_tickangle=-45,
         showlegend=False,
         template='plotly_white',
-        hovermode='closest'
+        hovermode='closest',
+        sliders=[{
+            'active': 0,
+            'currentvalue': {'prefix': 'year='},
+            'steps': [
+                {
+                    'args': [[str(year)], {
+                        'frame': {'duration': 0, 'redraw': False},
+                        'mode': 'immediate',
+                        'fromcurrent': True,
+                        'transition': {'duration': 0, 'easing': 'linear'}
+                    }],
+                    'method': 'animate',
+                    'label': str(year)
+                }
+                for year in per_year
+            ]
+        }]
     )
     
     # Configure animation settings
@@ -348,35 +569,61 @@ def create_animated_bubble_chart(df_filtered):
                                       "transition": {"duration": 0}}])
                 ]
             )
-        ]
+        ],
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
-def create_3d_regional_columns(df_filtered):
+def stem_line_coords(region_data):
+    """Build x/y/z arrays drawing one vertical stem per region, separated by NaN gaps."""
+    n = len(region_data)
+    xs = np.repeat(region_data['lon'].to_numpy(dtype=float), 3)
+    ys = np.repeat(region_data['lat'].to_numpy(dtype=float), 3)
+    zs = np.empty(3 * n)
+    zs[0::3] = 0
+    zs[1::3] = region_data['production_mwh'].to_numpy(dtype=float)
+    xs[2::3] = ys[2::3] = zs[2::3] = np.nan
+    return xs, ys, zs
+
+def build_regional_column_frames(region_columns):
+    """Build the per-year animation frames for the 3D regional columns (cached with the figure that holds them)."""
+    frames = []
+    
+    for year, year_data in region_columns.groupby('year', sort=True):
+        # Frames only carry what changes; styling is inherited from the base traces
+        markers_trace = go.Scatter3d(
+            x=year_data['lon'],
+            y=year_data['lat'],
+            z=year_data['production_mwh'],
+            marker=dict(color=year_data['production_mwh']),
+            text=("<b>" + year_data['region'].astype(str) + "</b><br>" +
+                  "Production: " + year_data['production_mwh'].map('{:,.0f}'.format) + " MWh<br>" +
+                  "Year: " + year_data['year'].astype(str))
+        )
+        
+        # Create lines for this year
+        xs, ys, zs = stem_line_coords(year_data)
+        lines_trace = go.Scatter3d(x=xs, y=ys, z=zs)
+        
+        frames.append(go.Frame(data=[markers_trace, lines_trace], traces=[0, 1], name=str(year)))
+    
+    return frames
+
+@st.cache_resource(hash_funcs=DF_HASH_FUNCS)
+def create_3d_regional_columns(year_region_totals):
     """Create 3D styled visualization with regions as columns, production as height."""
+    if year_region_totals.empty:
+        return None
+    
     try:
-        # Aggregate data by year and region
-        agg_data = df_filtered.groupby(['year', 'region']).agg({
-            'production_mwh': 'sum'
-        }).reset_index()
+        # Add coordinates for each region (defaulting to central France)
+        agg_data = year_region_totals.merge(COORDS_DF, left_on='region', right_index=True, how='left')
+        agg_data = agg_data.fillna({'lat': 48.5, 'lon': 2.5})
         
         # Get the latest year for initial display
         latest_year = agg_data['year'].max()
-        current_year_data = agg_data[agg_data['year'] == latest_year].copy()
-        
-        # Add coordinates for each region
-        current_year_data['lat'] = current_year_data['region'].map(
-            lambda x: REGION_COORDS.get(x, [48.5, 2.5])[0]
-        )
-        current_year_data['lon'] = current_year_data['region'].map(
-            lambda x: REGION_COORDS.get(x, [48.5, 2.5])[1]
-        )
-        
-        # Normalize production for color intensity
-        max_prod = current_year_data['production_mwh'].max()
-        current_year_data['color_intensity'] = (current_year_data['production_mwh'] / max_prod) * 255
+        current_year_data = agg_data.loc[agg_data['year'] == latest_year]
         
         # Create 3D scatter plot with bars effect using go.Bar3d or enhanced Scatter3d
         fig = go.Figure()
@@ -405,93 +652,32 @@ def create_3d_regional_columns(df_filtered):
                 opacity=0.9,
                 symbol='diamond'
             ),
-            text=current_year_data.apply(
-                lambda row: f"<b>{row['region']}</b><br>" +
-                           f"Production: {row['production_mwh']:,.0f} MWh<br>" +
-                           f"Year: {row['year']}",
-                axis=1
-            ),
+            text=("<b>" + current_year_data['region'].astype(str) + "</b><br>" +
+                  "Production: " + current_year_data['production_mwh'].map('{:,.0f}'.format) + " MWh<br>" +
+                  "Year: " + current_year_data['year'].astype(str)),
             hoverinfo='text',
             name='Regions'
         ))
         
         # Add connecting lines from base to top (optional visual effect)
-        for idx, row in current_year_data.iterrows():
-            fig.add_trace(go.Scatter3d(
-                x=[row['lon'], row['lon']],
-                y=[row['lat'], row['lat']],
-                z=[0, row['production_mwh']],
-                mode='lines',
-                line=dict(
-                    color='rgba(100,200,255,0.3)',
-                    width=4
-                ),
-                showlegend=False,
-                hoverinfo='skip',
-                name=''
-            ))
+        xs, ys, zs = stem_line_coords(current_year_data)
+        fig.add_trace(go.Scatter3d(
+            x=xs,
+            y=ys,
+            z=zs,
+            mode='lines',
+            line=dict(
+                color='rgba(100,200,255,0.3)',
+                width=4
+            ),
+            showlegend=False,
+            hoverinfo='skip',
+            name=''
+        ))
         
         # Create slider for year selection
         years_sorted = sorted(agg_data['year'].unique())
-        frames = []
-        
-        for year in years_sorted:
-            year_data = agg_data[agg_data['year'] == year].copy()
-            year_data['lat'] = year_data['region'].map(
-                lambda x: REGION_COORDS.get(x, [48.5, 2.5])[0]
-            )
-            year_data['lon'] = year_data['region'].map(
-                lambda x: REGION_COORDS.get(x, [48.5, 2.5])[1]
-            )
-            
-            # Create markers for this year
-            markers_trace = go.Scatter3d(
-                x=year_data['lon'],
-                y=year_data['lat'],
-                z=year_data['production_mwh'],
-                mode='markers',
-                marker=dict(
-                    size=20,
-                    color=year_data['production_mwh'],
-                    colorscale='Plasma',
-                    showscale=True,
-                    colorbar=dict(
-                        title="Production<br>(MWh)",
-                        thickness=20,
-                        len=0.7,
-                        x=1.02
-                    ),
-                    line=dict(color='white', width=3),
-                    opacity=0.9,
-                    symbol='diamond'
-                ),
-                text=year_data.apply(
-                    lambda row: f"<b>{row['region']}</b><br>" +
-                               f"Production: {row['production_mwh']:,.0f} MWh<br>" +
-                               f"Year: {row['year']}",
-                    axis=1
-                ),
-                hoverinfo='text',
-                name='Regions'
-            )
-            
-            # Create lines for this year
-            lines_traces = []
-            for idx, row in year_data.iterrows():
-                lines_traces.append(go.Scatter3d(
-                    x=[row['lon'], row['lon']],
-                    y=[row['lat'], row['lat']],
-                    z=[0, row['production_mwh']],
-                    mode='lines',
-                    line=dict(color='rgba(100,200,255,0.3)', width=4),
-                    showlegend=False,
-                    hoverinfo='skip'
-                ))
-            
-            frame_data = [markers_trace] + lines_traces
-            frames.append(go.Frame(data=frame_data, name=str(year)))
-        
-        fig.frames = frames
+        fig.frames = build_regional_column_frames(agg_data)
         
         # Update layout with 3D scene configuration
         fig.update_layout(
@@ -565,7 +751,8 @@ def create_3d_regional_columns(df_filtered):
                     for year in years_sorted
                 ]
             }],
-            font=dict(family='Arial, sans-serif', size=12, color='#333333')
+            font=dict(family='Arial, sans-serif', size=12, color='#333333'),
+            uirevision='filters'
         )
         
         return fig
@@ -574,75 +761,22 @@ def create_3d_regional_columns(df_filtered):
         st.error(f"Error creating 3D regional visualization: {e}")
         return None
 
-@st.cache_data
-def create_styled_regional_choropleth(df_filtered, year_selection=None):
+@st.cache_resource(hash_funcs=DF_HASH_FUNCS)
+def create_styled_regional_choropleth(year_region_totals, year_selection=None):
     """Create a styled and interactive choropleth map of French regions using GeoJSON from data."""
+    if year_region_totals.empty:
+        return None
+    
     try:
-        import json
-        
-        # Load raw data to get GeoJSON
-        raw_df = load_data()
-        if raw_df is None:
-            return None
-        
-        # Get unique regions with their GeoJSON
-        geo_regions = raw_df[['Nom INSEE région', 'Géo-shape région']].drop_duplicates()
-        geo_regions = geo_regions.rename(columns={'Nom INSEE région': 'region'})
-        
-        # Aggregate production by region and year
-        agg_data = df_filtered.groupby(['year', 'region']).agg({
-            'production_mwh': 'sum'
-        }).reset_index()
-        
         # Select year to display
         if year_selection is None:
-            year_selection = agg_data['year'].max()
-        
-        year_data = agg_data[agg_data['year'] == year_selection].copy()
-        
-        # Create GeoJSON structure
-        features = []
-        for idx, row in geo_regions.iterrows():
-            region_name = row['region']
-            geo_shape = row['Géo-shape région']
-            
-            # Parse GeoJSON if it's a string
-            try:
-                if isinstance(geo_shape, str):
-                    geo_json = json.loads(geo_shape)
-                else:
-                    geo_json = geo_shape
-            except:
-                continue
-            
-            # Get production value for this region in selected year
-            prod_value = year_data[year_data['region'] == region_name]['production_mwh'].values
-            prod_value = prod_value[0] if len(prod_value) > 0 else 0
-            
-            # Create feature
-            feature = {
-                "type": "Feature",
-                "properties": {
-                    "region": region_name,
-                    "production": prod_value
-                },
-                "geometry": geo_json
-            }
-            features.append(feature)
+            year_selection = year_region_totals['year'].max()
         
-        # Create FeatureCollection
-        geojson_data = {
-            "type": "FeatureCollection",
-            "features": features
-        }
-        
-        # Create region data for choropleth
-        region_prod = year_data.copy()
-        region_prod['region_name'] = region_prod['region']
+        region_prod = year_region_totals.loc[year_region_totals['year'] == year_selection]
         
         # Create choropleth map using go.Choroplethmapbox
         fig = go.Figure(data=go.Choroplethmapbox(
-            geojson=geojson_data,
+            geojson=build_region_geojson(),
             locations=region_prod['region'],
             z=region_prod['production_mwh'],
             featureidkey="properties.region",
@@ -679,7 +813,8 @@ def create_styled_regional_choropleth(df_filtered, year_selection=None):
             paper_bgcolor='white',
             plot_bgcolor='rgba(240, 240, 245, 0.5)',
             font=dict(family='Arial, sans-serif', size=12, color='#333333'),
-            hovermode='closest'
+            hovermode='closest',
+            uirevision='filters'
         )
         
         return fig
@@ -688,69 +823,32 @@ def create_styled_regional_choropleth(df_filtered, year_selection=None):
         st.error(f"Error creating choropleth map: {e}")
         return None
 
-@st.cache_data
-def create_3d_globe_map(df_filtered, year_selection=None):
+@st.cache_resource(hash_funcs=DF_HASH_FUNCS)
+def create_3d_globe_map(year_region_totals, region_centroids, year_selection=None):
     """Create a 3D globe visualization with regional production data."""
+    if year_region_totals.empty or region_centroids is None:
+        return None
+    
     try:
-        import json
-        
-        # Load raw data to get GeoJSON and coordinates
-        raw_df = load_data()
-        if raw_df is None:
-            return None
-        
-        # Get unique regions with their coordinates and GeoJSON
-        geo_regions = raw_df[['Nom INSEE région', 'Géo-point région', 'Géo-shape région']].drop_duplicates()
-        geo_regions = geo_regions.rename(columns={'Nom INSEE région': 'region'})
-        
-        # Aggregate production by region and year
-        agg_data = df_filtered.groupby(['year', 'region']).agg({
-            'production_mwh': 'sum'
-        }).reset_index()
-        
         # Select year to display
         if year_selection is None:
-            year_selection = agg_data['year'].max()
+            year_selection = year_region_totals['year'].max()
         
-        year_data = agg_data[agg_data['year'] == year_selection].copy()
+        year_data = year_region_totals.loc[year_region_totals['year'] == year_selection]
         
-        # Parse coordinates and merge production data
-        region_points = []
-        for idx, row in geo_regions.iterrows():
-            region_name = row['region']
-            geo_point_str = row['Géo-point région']
-            
-            # Parse coordinates from string like "48.688976812, 5.613113265"
-            try:
-                if pd.notna(geo_point_str):
-                    coords = str(geo_point_str).split(',')
-                    lat = float(coords[0].strip())
-                    lon = float(coords[1].strip())
-                else:
-                    continue
-            except:
-                continue
-            
-            # Get production value
-            prod_value = year_data[year_data['region'] == region_name]['production_mwh'].values
-            prod_value = prod_value[0] if len(prod_value) > 0 else 0
-            
-            region_points.append({
-                'region': region_name,
-                'lat': lat,
-                'lon': lon,
-                'production': prod_value
-            })
-        
-        region_df = pd.DataFrame(region_points)
+        # Merge pre-parsed region centroids with production data
+        region_df = region_centroids.merge(
+            year_data[['region', 'production_mwh']], on='region', how='left'
+        ).rename(columns={'production_mwh': 'production'})
+        region_df['production'] = region_df['production'].fillna(0)
         
         if region_df.empty:
             return None
         
-        # Normalize production for sizing
-        max_prod = region_df['production'].max()
-        min_prod = region_df['production'].min()
-        region_df['size'] = 5 + (region_df['production'] - min_prod) / (max_prod - min_prod) * 40
+        # Normalize production for sizing; a zero range (e.g. a single region) gets the minimum size
+        prod = region_df['production'].to_numpy(dtype=float)
+        prod_range = np.ptp(prod)
+        region_df['size'] = 5 + (prod - prod.min()) * (40 / prod_range if prod_range else 0)
         region_df['color'] = region_df['production']
         
         # Create 3D globe with scattergeo
@@ -779,10 +877,9 @@ def create_3d_globe_map(df_filtered, year_selection=None):
                 opacity=0.85,
                 sizemode='diameter'
             ),
-            text=region_df.apply(
-                lambda row: f"<b>{row['region']}</b><br>Production: {row['production']:,.0f} MWh<br>Year: {year_selection}",
-                axis=1
-            ),
+            text=("<b>" + region_df['region'].astype(str) +
+                  "</b><br>Production: " + region_df['production'].map('{:,.0f}'.format) +
+                  f" MWh<br>Year: {year_selection}"),
             hovertemplate='%{text}<extra></extra>',
             name='Regions'
         ))
@@ -820,7 +917,8 @@ def create_3d_globe_map(df_filtered, year_selection=None):
             paper_bgcolor='white',
             font=dict(family='Arial, sans-serif', size=12, color='#333333'),
             hovermode='closest',
-            showlegend=False
+            showlegend=False,
+            uirevision='filters'
         )
         
         return fig
@@ -829,89 +927,40 @@ def create_3d_globe_map(df_filtered, year_selection=None):
         st.error(f"Error creating 3D globe: {e}")
         return None
 
-@st.cache_data
-def create_sunburst_chart(df_filtered):
+@st.cache_resource(hash_funcs=DF_HASH_FUNCS)
+def create_sunburst_chart(region_energy_totals):
     """Create hierarchical sunburst chart of energy production."""
-    # Check if data is empty or all zeros
-    if df_filtered.empty or df_filtered['production_mwh'].sum() == 0:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for the selected filters",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16)
-        )
-        fig.update_layout(height=600)
-        return fig
-    
-    agg_data = df_filtered.groupby(['energy_type', 'region']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    # Check if data is empty
+    if region_energy_totals.empty:
+        return empty_figure()
     
     # Remove rows with zero production
-    agg_data = agg_data[agg_data['production_mwh'] > 0]
+    agg_data = build_energy_hierarchy(region_energy_totals)
     
     if agg_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No production data available",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16)
-        )
-        fig.update_layout(height=600)
-        return fig
+        return empty_figure("No production data available")
     
-    # Create hierarchical structure: Root -> Energy Types -> Regions
-    root_label = 'Total Energy'
-    
-    # Prepare labels and parents lists
-    labels = [root_label]
-    parents = ['']
-    values = [agg_data['production_mwh'].sum()]
-    colors = [agg_data['production_mwh'].sum()]
-    
-    # Add energy types as middle level
-    for energy in agg_data['energy_type'].unique():
-        labels.append(energy)
-        parents.append(root_label)
-        energy_total = agg_data[agg_data['energy_type'] == energy]['production_mwh'].sum()
-        values.append(energy_total)
-        colors.append(energy_total)
-    
-    # Add regions under energy types
-    for energy in agg_data['energy_type'].unique():
-        for region in agg_data[agg_data['energy_type'] == energy]['region'].unique():
-            labels.append(region)
-            parents.append(energy)
-            region_value = agg_data[(agg_data['energy_type'] == energy) & 
-                                  (agg_data['region'] == region)]['production_mwh'].values[0]
-            values.append(region_value)
-            colors.append(region_value)
-    
-    fig = go.Figure(go.Sunburst(
-        labels=labels,
-        parents=parents,
-        values=values,
-        marker=dict(
-            colorscale='Viridis',
-            cmid=np.median(values)
-        )
-    ))
+    # Root -> Energy Types -> Regions; Plotly Express assembles the hierarchy from the path
+    fig = px.sunburst(
+        agg_data,
+        path=[px.Constant('Total Energy'), 'energy_type', 'region'],
+        values='production_mwh',
+        color='production_mwh',
+        color_continuous_scale='Viridis'
+    )
     
-    fig.update_layout(title="Hierarchical Energy Production by Type and Region", height=600)
+    fig.update_layout(title="Hierarchical Energy Production by Type and Region", height=600, uirevision='filters')
     return fig
 
-@st.cache_data
-def create_heatmap_with_insights(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_heatmap_with_insights(region_energy_totals):
     """Create sophisticated heatmap of region vs energy type production."""
-    pivot_data = df_filtered.pivot_table(
-        index='region',
-        columns='energy_type',
-        values='production_mwh',
-        aggfunc='sum',
-        fill_value=0
-    )
+    if region_energy_totals.empty:
+        return empty_figure()
+    
+    pivot_data = region_energy_totals.groupby(
+        ['region', 'energy_type'], observed=True
+    )['production_mwh'].sum().unstack(fill_value=0)
     
     # Normalize for better visualization
     pivot_normalized = (pivot_data - pivot_data.min().min()) / (pivot_data.max().max() - pivot_data.min().min())
@@ -929,64 +978,40 @@ def create_heatmap_with_insights(df_filtered):
         title="Production Heatmap: Regions vs Energy Types",
         xaxis_title="Energy Type",
         yaxis_title="Region",
-        height=600
+        height=600,
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
-def create_regional_energy_share(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_regional_energy_share(region_energy_totals):
     """Create treemap showing energy share distribution."""
-    agg_data = df_filtered.groupby(['region', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    if region_energy_totals.empty:
+        return empty_figure(height=500)
     
-    # Create hierarchical structure: Root -> Energy Types -> Regions
-    root_label = 'Total Energy'
-    
-    # Prepare labels and parents lists
-    labels = [root_label]
-    parents = ['']
-    values = [agg_data['production_mwh'].sum()]
-    
-    # Add energy types as middle level
-    for energy in agg_data['energy_type'].unique():
-        labels.append(energy)
-        parents.append(root_label)
-        energy_total = agg_data[agg_data['energy_type'] == energy]['production_mwh'].sum()
-        values.append(energy_total)
-    
-    # Add regions under energy types
-    for energy in agg_data['energy_type'].unique():
-        for region in agg_data[agg_data['energy_type'] == energy]['region'].unique():
-            labels.append(region)
-            parents.append(energy)
-            region_value = agg_data[(agg_data['energy_type'] == energy) & 
-                                  (agg_data['region'] == region)]['production_mwh'].values[0]
-            values.append(region_value)
-    
-    fig = go.Figure(go.Treemap(
-        labels=labels,
-        parents=parents,
-        values=values,
-        marker=dict(colorscale='Greens', cmid=np.median(values))
-    ))
+    # Root -> Energy Types -> Regions; zero leaves are dropped so value-weighted colors stay defined
+    agg_data = build_energy_hierarchy(region_energy_totals)
     
-    fig.update_layout(title="Energy Distribution by Region and Type", height=500)
+    fig = px.treemap(
+        agg_data,
+        path=[px.Constant('Total Energy'), 'energy_type', 'region'],
+        values='production_mwh',
+        color='production_mwh',
+        color_continuous_scale='Greens'
+    )
+    
+    fig.update_layout(title="Energy Distribution by Region and Type", height=500, uirevision='filters')
     return fig
 
-@st.cache_data
-def create_energy_growth_rate(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_energy_growth_rate(energy_yearly_trends):
     """Create advanced growth rate visualization."""
-    energy_yearly = df_filtered.groupby(['year', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index().sort_values(['energy_type', 'year'])
-    
-    # Calculate growth rate
-    energy_yearly['growth_rate'] = energy_yearly.groupby('energy_type')['production_mwh'].pct_change() * 100
+    if energy_yearly_trends.empty:
+        return empty_figure(height=400)
     
     fig = px.line(
-        energy_yearly,
+        energy_yearly_trends,
         x='year',
         y='growth_rate',
         color='energy_type',
@@ -997,26 +1022,20 @@ def create_energy_growth_rate(df_filtered):
     )
     
     fig.add_hline(y=0, line_dash="dash", line_color="red", annotation_text="Zero Growth")
-    fig.update_layout(height=400)
+    fig.update_layout(height=400, uirevision='filters')
     return fig
 
 @st.cache_resource
-def create_interactive_map(df_filtered):
-    """Create interactive Folium map with production by region - enhanced aesthetic."""
-    try:
-        # Aggregate by region
-        region_prod = df_filtered.groupby('region').agg({
-            'production_mwh': 'sum'
-        }).reset_index()
-        
-        # Base map centered on France with better tiles
-        m = folium.Map(
-            location=[46.5, 2.5],
-            zoom_start=5,
-            tiles='CartoDB positron',
-            prefer_canvas=True
-        )
-        
+def build_folium_base_map(location, zoom_start, title_html, osm_layer=False):
+    """Build the static part of a Folium map (tiles and title) once; callers deep-copy it before adding markers."""
+    m = folium.Map(
+        location=list(location),
+        zoom_start=zoom_start,
+        tiles='CartoDB positron',
+        prefer_canvas=True
+    )
+    
+    if osm_layer:
         # Add a tile layer for better aesthetics
         folium.TileLayer(
             tiles='https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png',
@@ -1025,70 +1044,51 @@ def create_interactive_map(df_filtered):
             overlay=False,
             control=False
         ).add_to(m)
-        
-        # Normalize production for color scaling
-        max_prod = region_prod['production_mwh'].max()
-        min_prod = region_prod['production_mwh'].min()
-        
-        # Create custom color scale (green gradient)
-        def get_color(value):
-            """Generate color based on production value."""
-            if max_prod == min_prod:
-                norm_val = 0.5
-            else:
-                norm_val = (value - min_prod) / (max_prod - min_prod)
-            
-            # Green gradient: light to dark
-            if norm_val < 0.2:
-                return '#fee5d9'  # very light
-            elif norm_val < 0.4:
-                return '#fcae91'  # light
-            elif norm_val < 0.6:
-                return '#fb6a4a'  # medium
-            elif norm_val < 0.8:
-                return '#de2d26'  # dark
-            else:
-                return '#a50f15'  # very dark
-        
-        # Add markers for each region with enhanced styling
-        for idx, row in region_prod.iterrows():
-            region = row['region']
-            production = row['production_mwh']
-            
-            if region in REGION_COORDS:
-                coords = REGION_COORDS[region]
-                
-                # Color intensity based on production
-                norm_prod = (production - min_prod) / (max_prod - min_prod) if max_prod > min_prod else 0
-                color = get_color(production)
-                
-                # Size based on production (radius between 8 and 25)
-                radius = 8 + (norm_prod * 17)
-                
-                # Create popup with styled HTML
-                popup_html = f"""
-                <div style="font-family: Arial; width: 200px;">
-                    <h4 style="margin: 0 0 10px 0; color: #333;">{region}</h4>
-                    <hr style="margin: 5px 0;">
-                    <p style="margin: 5px 0;"><b>Production:</b> {production:,.0f} MWh</p>
-                    <p style="margin: 5px 0;"><b>Percentage:</b> {(production/region_prod['production_mwh'].sum()*100):.1f}%</p>
-                </div>
-                """
-                
-                folium.CircleMarker(
-                    location=coords,
-                    radius=radius,
-                    popup=folium.Popup(popup_html, max_width=250),
-                    tooltip=f"{region}: {production:,.0f} MWh",
-                    color=color,
-                    fill=True,
-                    fillColor=color,
-                    fillOpacity=0.85,
-                    weight=3,
-                    opacity=1.0
-                ).add_to(m)
-        
-        # Add title to map
+    
+    m.get_root().html.add_child(folium.Element(title_html))
+    return m
+
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def region_circle_markers(df_filtered, palette, bin_edges, radius_base, radius_scale, popup_template,
+                          bin_side='left', color_flat_value=0.0):
+    """CircleMarker arguments (coords, radius, color, popup HTML, tooltip) shared by both Folium region maps."""
+    if df_filtered.empty:
+        return []
+    
+    # Aggregate by region
+    region_prod = aggregate_by_region(df_filtered)
+    
+    # Normalize production for color scaling
+    production_values = region_prod['production_mwh'].to_numpy()
+    norm_prod = min_max_scale(production_values)
+    norm_color = min_max_scale(production_values, flat_value=color_flat_value)
+    
+    # Bin into the gradient in one lookup instead of a per-region if/elif ladder
+    region_prod['color'] = palette[np.searchsorted(bin_edges, norm_color, side=bin_side)]
+    region_prod['radius'] = radius_base + norm_prod * radius_scale
+    
+    # Share of the total, computed once for all popups
+    region_prod['share'] = production_values / production_values.sum() * 100
+    
+    # Colors and sizes are scaled over every region; only those with coordinates get a marker
+    mapped = region_prod.astype({'region': str}).merge(COORDS_DF, left_on='region', right_index=True)
+    rows = list(zip(mapped['region'], mapped['production_mwh'], mapped['share']))
+    
+    popups = [popup_template.format(region=region, production=production, share=share)
+              for region, production, share in rows]
+    tooltips = [f"{region}: {production:,.0f} MWh" for region, production, _ in rows]
+    
+    return list(zip(
+        mapped[['lat', 'lon']].to_numpy().tolist(),
+        mapped['radius'].tolist(),
+        mapped['color'].tolist(),
+        popups,
+        tooltips
+    ))
+
+def create_interactive_map(df_filtered):
+    """Create interactive Folium map with production by region - enhanced aesthetic."""
+    try:
         title_html = '''
         <div style="position: fixed; 
                     top: 10px; left: 50px; width: 300px; height: 60px; 
@@ -1098,44 +1098,71 @@ def create_interactive_map(df_filtered):
             France Renewable Energy Production by Region
         </div>
         '''
-        m.get_root().html.add_child(folium.Element(title_html))
+        
+        # Base map centered on France with better tiles, built once and copied per selection
+        m = copy.deepcopy(build_folium_base_map((46.5, 2.5), 5, title_html, osm_layer=True))
+        
+        # Styled HTML popup for each region
+        popup_template = """
+        <div style="font-family: Arial; width: 200px;">
+            <h4 style="margin: 0 0 10px 0; color: #333;">{region}</h4>
+            <hr style="margin: 5px 0;">
+            <p style="margin: 5px 0;"><b>Production:</b> {production:,.0f} MWh</p>
+            <p style="margin: 5px 0;"><b>Percentage:</b> {share:.1f}%</p>
+        </div>
+        """
+        
+        # Add markers for each region with enhanced styling, grouped into a single Leaflet layer;
+        # light to dark gradient, radius between 8 and 25
+        markers_layer = folium.FeatureGroup(name='Regional production')
+        markers = region_circle_markers(
+            df_filtered, MARKER_PALETTE, MARKER_BIN_EDGES, 8, 17, popup_template,
+            bin_side='right', color_flat_value=0.5
+        )
+        for coords, radius, color, popup_html, tooltip in markers:
+            folium.CircleMarker(
+                location=coords,
+                radius=radius,
+                popup=folium.Popup(popup_html, max_width=250),
+                tooltip=tooltip,
+                color=color,
+                fill=True,
+                fillColor=color,
+                fillOpacity=0.85,
+                weight=3,
+                opacity=1.0
+            ).add_to(markers_layer)
+        markers_layer.add_to(m)
         
         return m
     except Exception as e:
         st.error(f"Error creating map: {e}")
         return None
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_3d_globe(df_filtered):
     """Create 3D globe visualization showing regional production."""
+    if df_filtered.empty:
+        return None
+    
     try:
-        region_prod = df_filtered.groupby('region').agg({
-            'production_mwh': 'sum'
-        }).reset_index()
-        
-        coords_data = []
-        for idx, row in region_prod.iterrows():
-            region = row['region']
-            if region in REGION_COORDS:
-                lat, lon = REGION_COORDS[region]
-                coords_data.append({
-                    'lat': lat,
-                    'lon': lon,
-                    'region': region,
-                    'production': row['production_mwh']
-                })
+        region_prod = aggregate_by_region(df_filtered)
         
-        if not coords_data:
+        # Inner join on the coordinate table keeps only regions that can be placed on the map
+        coords_df = region_prod.astype({'region': str}).merge(COORDS_DF, left_on='region', right_index=True)
+        if coords_df.empty:
             return None
-            
-        coords_df = pd.DataFrame(coords_data)
+        coords_df = coords_df.rename(columns={'production_mwh': 'production'})
+        
+        # Normalize over the mapped regions only, so an unplaceable region cannot shrink every marker
+        coords_df['norm'] = coords_df['production'] / coords_df['production'].max()
         
         fig = go.Figure(data=go.Scattergeo(
             lon=coords_df['lon'],
             lat=coords_df['lat'],
             mode='markers+text',
             marker=dict(
-                size=coords_df['production'] / coords_df['production'].max() * 30,
+                size=coords_df['norm'] * 30,
                 color=coords_df['production'],
                 colorscale='Viridis',
                 showscale=True,
@@ -1155,7 +1182,8 @@ def create_3d_globe(df_filtered):
                 landcolor='rgb(243, 243, 243)',
                 projection_type='natural earth'
             ),
-            height=600
+            height=600,
+            uirevision='filters'
         )
         
         return fig
@@ -1163,10 +1191,13 @@ def create_3d_globe(df_filtered):
         st.error(f"Error creating globe: {e}")
         return None
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_energy_composition_bar(df_filtered):
     """Create horizontal bar chart of energy composition."""
-    energy_comp = df_filtered.groupby('energy_type').agg({
+    if df_filtered.empty:
+        return empty_figure(height=400)
+    
+    energy_comp = df_filtered.groupby('energy_type', observed=True).agg({
         'production_mwh': 'sum'
     }).reset_index().sort_values('production_mwh', ascending=True)
     
@@ -1181,80 +1212,75 @@ def create_energy_composition_bar(df_filtered):
         color_continuous_scale='RdYlGn'
     )
     
-    fig.update_layout(height=400, showlegend=False)
+    fig.update_layout(height=400, showlegend=False, uirevision='filters')
     return fig
 
-@st.cache_data
-def create_regional_composition_stacked(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_regional_composition_stacked(region_energy_totals):
     """Create stacked bar chart of regions by energy type."""
-    pivot_data = df_filtered.pivot_table(
-        index='region',
-        columns='energy_type',
-        values='production_mwh',
-        aggfunc='sum',
-        fill_value=0
-    )
+    if region_energy_totals.empty:
+        return empty_figure()
     
     # Sort by total production
-    pivot_data['total'] = pivot_data.sum(axis=1)
-    pivot_data = pivot_data.sort_values('total', ascending=True).drop('total', axis=1)
+    region_order = region_energy_totals.groupby('region', observed=True)['production_mwh'].sum().sort_values().index
     
-    fig = go.Figure()
-    
-    for energy_type in pivot_data.columns:
-        fig.add_trace(go.Bar(
-            y=pivot_data.index,
-            x=pivot_data[energy_type],
-            name=energy_type,
-            orientation='h'
-        ))
+    # The totals are already long-format, so Plotly Express can build every stacked trace in one call
+    fig = px.bar(
+        region_energy_totals.astype({'region': str, 'energy_type': str}),
+        x='production_mwh',
+        y='region',
+        color='energy_type',
+        orientation='h',
+        barmode='stack',
+        category_orders={'region': region_order.astype(str).tolist()}
+    )
     
     fig.update_layout(
-        barmode='stack',
         title='Energy Composition by Region (Stacked)',
         xaxis_title='Production (MWh)',
         yaxis_title='Region',
         height=600,
-        hovermode='x unified'
+        hovermode='x unified',
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
-def create_time_series_decomposition(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_time_series_decomposition(year_energy_totals):
     """Create multi-line time series showing production trends."""
-    ts_data = df_filtered.groupby(['year', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    if year_energy_totals.empty:
+        return empty_figure(height=400)
     
     fig = px.line(
-        ts_data,
+        year_energy_totals,
         x='year',
         y='production_mwh',
         color='energy_type',
         markers=True,
         title='Energy Production Trends Over Time',
         labels={'production_mwh': 'Production (MWh)', 'year': 'Year'},
-        hover_data={'production_mwh': ':,.0f'}
+        hover_data={'production_mwh': ':,.0f'},
+        render_mode='webgl'
     )
     
     fig.update_layout(
         hovermode='x unified',
         height=400,
-        template='plotly_white'
+        template='plotly_white',
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
-def create_region_vs_energy_scatter(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_region_vs_energy_scatter(region_energy_totals):
     """Create scatter plot showing region-energy relationships."""
-    region_energy = df_filtered.groupby(['region', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    if region_energy_totals.empty:
+        return empty_figure()
     
     fig = px.scatter(
-        region_energy,
+        region_energy_totals,
         x='energy_type',
         y='region',
         size='production_mwh',
@@ -1263,24 +1289,26 @@ def create_region_vs_energy_scatter(df_filtered):
         hover_data={'energy_type': True, 'production_mwh': ':,.0f'},
         title='Region vs Energy Type Production Matrix',
         color_continuous_scale='Viridis',
-        size_max=50
+        size_max=50,
+        render_mode='webgl'
     )
     
-    fig.update_layout(height=600)
+    fig.update_layout(height=600, uirevision='filters')
     return fig
 
-@st.cache_data
-def create_3d_ribbon_chart(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_3d_ribbon_chart(year_energy_totals):
     """Create 3D ribbon chart showing energy flow."""
-    energy_yearly = df_filtered.groupby(['year', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index().sort_values(['energy_type', 'year'])
+    if year_energy_totals.empty:
+        return empty_figure(height=500)
+    
+    energy_yearly = year_energy_totals.sort_values(['energy_type', 'year'])
     
     fig = go.Figure()
     
-    for energy_type in energy_yearly['energy_type'].unique():
-        data = energy_yearly[energy_yearly['energy_type'] == energy_type]
-        fig.add_trace(go.Scatter(
+    # One hashed pass splits the series instead of a boolean mask per energy type
+    for energy_type, data in energy_yearly.groupby('energy_type', observed=True, sort=False):
+        fig.add_trace(go.Scattergl(
             x=data['year'],
             y=data['production_mwh'],
             mode='lines',
@@ -1294,14 +1322,18 @@ def create_3d_ribbon_chart(df_filtered):
         yaxis_title='Production (MWh)',
         hovermode='x unified',
         height=500,
-        template='plotly_white'
+        template='plotly_white',
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_box_plot_by_region(df_filtered):
     """Create box plot showing production distribution by region."""
+    if df_filtered.empty:
+        return empty_figure(height=500)
+    
     fig = px.box(
         df_filtered,
         x='region',
@@ -1312,12 +1344,15 @@ def create_box_plot_by_region(df_filtered):
         height=500
     )
     
-    fig.update_layout(showlegend=False, xaxis_tickangle=-45)
+    fig.update_layout(showlegend=False, xaxis_tickangle=-45, uirevision='filters')
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_violin_plot_by_energy(df_filtered):
     """Create violin plot showing production distribution by energy type."""
+    if df_filtered.empty:
+        return empty_figure(height=500)
+    
     fig = px.violin(
         df_filtered,
         x='energy_type',
@@ -1328,16 +1363,22 @@ def create_violin_plot_by_energy(df_filtered):
         height=500
     )
     
-    fig.update_layout(showlegend=False, xaxis_tickangle=-45)
+    fig.update_layout(showlegend=False, xaxis_tickangle=-45, uirevision='filters')
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_parallel_categories(df_filtered):
     """Create parallel categories plot for multi-dimensional analysis."""
-    sample_df = df_filtered.sample(min(100, len(df_filtered)))
-    sample_df['production_bucket'] = pd.cut(sample_df['production_mwh'], 
-                                            bins=3, 
-                                            labels=['Low', 'Medium', 'High'])
+    if df_filtered.empty:
+        return empty_figure()
+    
+    # Pick the rows by position so the sampler never permutes the whole filtered index
+    n_rows = len(df_filtered)
+    sample_idx = np.random.default_rng(0).choice(n_rows, size=min(100, n_rows), replace=False)
+    sample_df = df_filtered.take(sample_idx)
+    sample_df = sample_df.assign(production_bucket=pd.cut(sample_df['production_mwh'],
+                                                          bins=3,
+                                                          labels=['Low', 'Medium', 'High']))
     
     fig = px.parallel_categories(
         sample_df,
@@ -1348,18 +1389,17 @@ def create_parallel_categories(df_filtered):
         height=600
     )
     
-    fig.update_layout(margin=dict(l=100, r=100, t=100, b=100))
+    fig.update_layout(margin=dict(l=100, r=100, t=100, b=100), uirevision='filters')
     return fig
 
-@st.cache_data
-def create_area_chart_regions(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_area_chart_regions(year_region_totals):
     """Create stacked area chart showing regional production over time."""
-    area_data = df_filtered.groupby(['year', 'region']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    if year_region_totals.empty:
+        return empty_figure(height=400)
     
     fig = px.area(
-        area_data,
+        year_region_totals,
         x='year',
         y='production_mwh',
         color='region',
@@ -1368,36 +1408,26 @@ def create_area_chart_regions(df_filtered):
         hover_data={'production_mwh': ':,.0f'}
     )
     
-    fig.update_layout(height=400, hovermode='x unified')
+    fig.update_layout(height=400, hovermode='x unified', uirevision='filters')
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_3d_pydeck_map(df_filtered):
     """Create 3D Pydeck map showing production as height."""
+    if df_filtered.empty:
+        return None
+    
     try:
-        region_prod = df_filtered.groupby('region').agg({
-            'production_mwh': 'sum'
-        }).reset_index()
-        
-        map_data = []
-        for idx, row in region_prod.iterrows():
-            region = row['region']
-            if region in REGION_COORDS:
-                lat, lon = REGION_COORDS[region]
-                map_data.append({
-                    'lat': lat,
-                    'lon': lon,
-                    'production': row['production_mwh'],
-                    'region': region
-                })
+        region_prod = aggregate_by_region(df_filtered)
         
-        if not map_data:
+        # Inner join on the coordinate table keeps only regions that can be placed on the map
+        map_df = region_prod.astype({'region': str}).merge(COORDS_DF, left_on='region', right_index=True)
+        if map_df.empty:
             return None
+        map_df = map_df.rename(columns={'production_mwh': 'production'})
         
-        map_df = pd.DataFrame(map_data)
-        
-        # Normalize production for column height
-        map_df['height'] = (map_df['production'] / map_df['production'].max()) * 50000
+        # Normalize production for column height over the mapped regions only
+        map_df['height'] = map_df['production'] / map_df['production'].max() * 50000
         
         layer = pdk.Layer(
             'ColumnLayer',
@@ -1429,60 +1459,51 @@ def create_3d_pydeck_map(df_filtered):
         st.error(f"Error creating 3D map: {e}")
         return None
 
-@st.cache_data
-def create_heatmap_timeline(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_heatmap_timeline(year_region_totals):
     """Create calendar heatmap showing production intensity over years."""
-    yearly_data = df_filtered.groupby(['year', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index()
+    if year_region_totals.empty:
+        return empty_figure(height=500)
     
-    fig = px.density_heatmap(
-        df_filtered.groupby(['year', 'region']).agg({'production_mwh': 'sum'}).reset_index(),
-        x='year',
-        y='region',
-        z='production_mwh',
-        color_continuous_scale='YlGn',
+    # The totals are already exact per (region, year), so draw them as-is instead of letting Plotly re-bin
+    pivot_data = year_region_totals.groupby(
+        ['region', 'year'], observed=True
+    )['production_mwh'].sum().unstack(fill_value=0)
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=pivot_data.values,
+        x=pivot_data.columns,
+        y=pivot_data.index,
+        colorscale='YlGn',
+        colorbar=dict(title="Production (MWh)"),
+        hovertemplate='Year: %{x}<br>Region: %{y}<br>Production: %{z:,.0f} MWh<extra></extra>'
+    ))
+    
+    fig.update_layout(
         title='Production Heatmap: Year vs Region',
-        labels={'production_mwh': 'Production (MWh)'},
-        nbinsx=len(df_filtered['year'].unique()),
-        nbinsy=len(df_filtered['region'].unique())
+        xaxis_title='Year',
+        yaxis_title='Region',
+        height=500,
+        uirevision='filters'
     )
-    
-    fig.update_layout(height=500)
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_sunburst_by_year(df_filtered):
     """Create hierarchical sunburst drill-down by year."""
-    # Check if data is empty or all zeros
-    if df_filtered.empty or df_filtered['production_mwh'].sum() == 0:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for the selected filters",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16)
-        )
-        fig.update_layout(height=600)
-        return fig
+    # Check if data is empty
+    if df_filtered.empty:
+        return empty_figure()
     
-    year_data = df_filtered.groupby(['year', 'energy_type', 'region']).agg({
+    year_data = df_filtered.groupby(['year', 'energy_type', 'region'], observed=True).agg({
         'production_mwh': 'sum'
     }).reset_index()
     
-    # Remove rows with zero production
-    year_data = year_data[year_data['production_mwh'] > 0]
+    # Remove rows with zero production; plain strings keep px's path grouping to observed values
+    year_data = year_data[year_data['production_mwh'] > 0].astype({'energy_type': str, 'region': str})
     
     if year_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No production data available",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16)
-        )
-        fig.update_layout(height=600)
-        return fig
+        return empty_figure("No production data available")
     
     fig = px.sunburst(
         year_data,
@@ -1494,28 +1515,33 @@ def create_sunburst_by_year(df_filtered):
         height=600
     )
     
+    fig.update_layout(uirevision='filters')
+    
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_scatter_matrix_energy(df_filtered):
     """Create a bubble chart showing top 3 energy types production across regions."""
+    if df_filtered.empty:
+        return empty_figure()
+    
     # Filter out aggregate energy types (électricité, totale, etc.)
     exclude_keywords = ['électricité', 'totale', 'total', 'électrique']
     df_specific = df_filtered[
         ~df_filtered['energy_type'].str.lower().str.contains('|'.join(exclude_keywords), na=False)
-    ].copy()
+    ]
     
     # Get top 3 energy types
-    top_energy = df_specific.groupby('energy_type')['production_mwh'].sum().nlargest(3).index.tolist()
-    df_top = df_specific[df_specific['energy_type'].isin(top_energy)].copy()
+    top_energy = df_specific.groupby('energy_type', observed=True)['production_mwh'].sum().nlargest(3).index.tolist()
+    df_top = df_specific[df_specific['energy_type'].isin(top_energy)]
     
     # Aggregate by region and energy type
-    agg_data = df_top.groupby(['region', 'energy_type']).agg({
+    agg_data = df_top.groupby(['region', 'energy_type'], observed=True).agg({
         'production_mwh': 'sum'
-    }).reset_index()
+    }).reset_index().astype({'region': str, 'energy_type': str})
     
     # Sort regions by total production for better visualization
-    region_totals = agg_data.groupby('region')['production_mwh'].sum().sort_values(ascending=False)
+    region_totals = agg_data.groupby('region', observed=True)['production_mwh'].sum().sort_values(ascending=False)
     
     # Clean energy type names for display
     energy_names = {col: col.replace('Production ', '').replace(' renouvelable', '').replace(' (GWh)', '').strip().title() 
@@ -1534,7 +1560,8 @@ def create_scatter_matrix_energy(df_filtered):
         labels={'production_mwh': 'Production (MWh)', 'region': 'Region', 'energy_type_clean': 'Energy Type'},
         color_discrete_sequence=['#1f7e3f', '#ff9800', '#2196f3'],
         size_max=40,
-        height=600
+        height=600,
+        render_mode='webgl'
     )
     
     # Update layout for clarity
@@ -1549,7 +1576,8 @@ def create_scatter_matrix_energy(df_filtered):
             xanchor='center',
             font=dict(size=14, color='#1a1a1a', family='Arial')
         ),
-        margin=dict(l=80, r=80, t=120, b=100)
+        margin=dict(l=80, r=80, t=120, b=100),
+        uirevision='filters'
     )
     
     # Enhance grid
@@ -1558,33 +1586,34 @@ def create_scatter_matrix_energy(df_filtered):
     
     return fig
 
-@st.cache_data
-def create_cumulative_production(df_filtered):
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
+def create_cumulative_production(energy_yearly_trends):
     """Create cumulative production over time."""
-    yearly = df_filtered.groupby(['year', 'energy_type']).agg({
-        'production_mwh': 'sum'
-    }).reset_index().sort_values(['energy_type', 'year'])
-    
-    yearly['cumulative'] = yearly.groupby('energy_type')['production_mwh'].cumsum()
+    if energy_yearly_trends.empty:
+        return empty_figure(height=400)
     
     fig = px.line(
-        yearly,
+        energy_yearly_trends,
         x='year',
         y='cumulative',
         color='energy_type',
         markers=True,
         title='Cumulative Energy Production Over Time',
         labels={'cumulative': 'Cumulative Production (MWh)', 'year': 'Year'},
-        hover_data={'cumulative': ':,.0f'}
+        hover_data={'cumulative': ':,.0f'},
+        render_mode='webgl'
     )
     
-    fig.update_layout(height=400, hovermode='x unified')
+    fig.update_layout(height=400, hovermode='x unified', uirevision='filters')
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_gauge_charts_data(df_filtered):
     """Create gauge chart for current production percentage."""
-    by_energy = df_filtered.groupby('energy_type')['production_mwh'].sum()
+    if df_filtered.empty:
+        return empty_figure(height=400)
+    
+    by_energy = df_filtered.groupby('energy_type', observed=True)['production_mwh'].sum()
     total = by_energy.sum()
     
     top_energy = by_energy.nlargest(1).index[0]
@@ -1612,13 +1641,16 @@ def create_gauge_charts_data(df_filtered):
         }
     ))
     
-    fig.update_layout(height=400)
+    fig.update_layout(height=400, uirevision='filters')
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_polar_energy_distribution(df_filtered):
     """Create polar/radar chart of energy distribution."""
-    by_energy = df_filtered.groupby('energy_type')['production_mwh'].sum().sort_values(ascending=False).head(8)
+    if df_filtered.empty:
+        return empty_figure(height=500)
+    
+    by_energy = df_filtered.groupby('energy_type', observed=True)['production_mwh'].sum().sort_values(ascending=False).head(8)
     
     fig = go.Figure(data=go.Scatterpolar(
         r=by_energy.values,
@@ -1631,38 +1663,34 @@ def create_polar_energy_distribution(df_filtered):
         polar=dict(radialaxis=dict(visible=True, range=[0, by_energy.max()])),
         title='Energy Types Distribution (Polar Chart)',
         showlegend=False,
-        height=500
+        height=500,
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_data
+@st.cache_data(hash_funcs=DF_HASH_FUNCS)
 def create_waterfall_production_change(df_filtered):
     """Create waterfall chart showing production change by energy type."""
-    if len(df_filtered['year'].unique()) < 2:
+    if df_filtered['year'].nunique() < 2:
         return None
     
-    years = sorted(df_filtered['year'].unique())
-    start_year = years[0]
-    end_year = years[-1]
+    start_year = df_filtered['year'].min()
+    end_year = df_filtered['year'].max()
     
-    start_data = df_filtered[df_filtered['year'] == start_year].groupby('energy_type')['production_mwh'].sum()
-    end_data = df_filtered[df_filtered['year'] == end_year].groupby('energy_type')['production_mwh'].sum()
+    start_data = df_filtered[df_filtered['year'] == start_year].groupby('energy_type', observed=True)['production_mwh'].sum()
+    end_data = df_filtered[df_filtered['year'] == end_year].groupby('energy_type', observed=True)['production_mwh'].sum()
     
-    all_energy_types = list(set(start_data.index) | set(end_data.index))
-    changes = {}
+    # Aligned subtraction: an energy type missing from one year counts as zero there
+    changes = end_data.sub(start_data, fill_value=0)
+    changes = changes[changes != 0]
     
-    for energy in all_energy_types:
-        change = end_data.get(energy, 0) - start_data.get(energy, 0)
-        if change != 0:
-            changes[energy] = change
-    
-    if not changes:
+    if changes.empty:
         return None
     
     fig = go.Figure(go.Waterfall(
-        x=list(changes.keys()),
-        y=list(changes.values()),
+        x=changes.index.astype(str).tolist(),
+        y=changes.values,
         connector={'line': {'color': "gray"}},
         decreasing={"marker": {"color": "red"}},
         increasing={"marker": {"color": "green"}}
@@ -1671,75 +1699,14 @@ def create_waterfall_production_change(df_filtered):
     fig.update_layout(
         title=f'Production Change by Energy Type ({start_year} to {end_year})',
         height=400,
-        xaxis_tickangle=-45
+        xaxis_tickangle=-45,
+        uirevision='filters'
     )
     
     return fig
 
-@st.cache_resource
 def create_folium_choropleth_attempt(df_filtered):
     """Create Folium map with enhanced styling."""
-    region_prod = df_filtered.groupby('region').agg({
-        'production_mwh': 'sum'
-    }).reset_index()
-    
-    # Base map centered on France
-    m = folium.Map(
-        location=[46.2276, 2.2137],
-        zoom_start=6,
-        tiles='CartoDB positron',
-        prefer_canvas=True
-    )
-    
-    # Normalize production for color scaling
-    max_prod = region_prod['production_mwh'].max()
-    min_prod = region_prod['production_mwh'].min()
-    
-    # Create color mapping function
-    def get_color(production):
-        norm = (production - min_prod) / (max_prod - min_prod) if max_prod > min_prod else 0
-        if norm > 0.9:
-            return '#004529'  # Very dark green
-        elif norm > 0.75:
-            return '#1b7837'  # Dark green
-        elif norm > 0.6:
-            return '#4dac26'  # Medium green
-        elif norm > 0.4:
-            return '#b8e186'  # Light green
-        elif norm > 0.2:
-            return '#f1b6da'  # Pink
-        else:
-            return '#d01c8b'  # Dark pink
-    
-    # Add markers for each region with custom popups
-    for idx, row in region_prod.iterrows():
-        region = row['region']
-        production = row['production_mwh']
-        
-        if region in REGION_COORDS:
-            coords = REGION_COORDS[region]
-            color = get_color(production)
-            
-            # Create custom popup with more information
-            popup_text = f"""
-            <b style='font-size: 14px; color: #1f7e3f;'>{region}</b><br>
-            <b>Production:</b> {production:,.0f} MWh<br>
-            <b>Percentage:</b> {(production/region_prod['production_mwh'].sum()*100):.1f}%
-            """
-            
-            folium.CircleMarker(
-                location=coords,
-                radius=5 + (10 * (production - min_prod) / (max_prod - min_prod)) if max_prod > min_prod else 5,
-                popup=folium.Popup(popup_text, max_width=300),
-                tooltip=f"{region}: {production:,.0f} MWh",
-                color=color,
-                fill=True,
-                fillColor=color,
-                fillOpacity=0.8,
-                weight=2
-            ).add_to(m)
-    
-    # Add title to map
     title_html = '''
         <div style="position: fixed; 
         top: 10px; left: 50px; width: 300px; height: 80px; 
@@ -1751,7 +1718,34 @@ def create_folium_choropleth_attempt(df_filtered):
         </p>
         </div>
     '''
-    m.get_root().html.add_child(folium.Element(title_html))
+    
+    # Base map centered on France, built once and copied per selection
+    m = copy.deepcopy(build_folium_base_map((46.2276, 2.2137), 6, title_html))
+    
+    # Custom popups with more information
+    popup_template = """
+        <b style='font-size: 14px; color: #1f7e3f;'>{region}</b><br>
+        <b>Production:</b> {production:,.0f} MWh<br>
+        <b>Percentage:</b> {share:.1f}%
+        """
+    
+    # Add markers for each region with custom popups, grouped into a single Leaflet layer;
+    # dark pink to very dark green, radius between 5 and 15
+    markers_layer = folium.FeatureGroup(name='Regional production')
+    markers = region_circle_markers(df_filtered, CHOROPLETH_PALETTE, CHOROPLETH_BIN_EDGES, 5, 10, popup_template)
+    for coords, radius, color, popup_text, tooltip in markers:
+        folium.CircleMarker(
+            location=coords,
+            radius=radius,
+            popup=folium.Popup(popup_text, max_width=300),
+            tooltip=tooltip,
+            color=color,
+            fill=True,
+            fillColor=color,
+            fillOpacity=0.8,
+            weight=2
+        ).add_to(markers_layer)
+    markers_layer.add_to(m)
     
     return m
 
@@ -1771,10 +1765,10 @@ if df is None or df.empty:
 
 st.sidebar.header("Controls")
 
-# Get available values for filters
-available_years = sorted(df['year'].unique())
-available_energy_types = sorted(df['energy_type'].unique())
-available_regions = sorted(df['region'].unique())
+# Get available values for filters (categories are inferred from the cleaned rows, so already sorted and all present)
+available_years = df['year'].unique()  # df is sorted by year, so this small array is already ordered
+available_energy_types = df['energy_type'].cat.categories.tolist()
+available_regions = df['region'].cat.categories.tolist()
 
 # Year range filter
 year_range = st.sidebar.slider(
@@ -1798,13 +1792,8 @@ selected_regions = st.sidebar.multiselect(
     default=available_regions
 )
 
-# Apply filters
-df_filtered = df[
-    (df['year'] >= year_range[0]) &
-    (df['year'] <= year_range[1]) &
-    (df['energy_type'].isin(selected_energy_types)) &
-    (df['region'].isin(selected_regions))
-].copy()
+# Apply filters once; every chart below receives this slice and does no filtering of its own
+df_filtered = apply_filters(df, *year_range, tuple(selected_energy_types), tuple(selected_regions))
 
 
 # MAIN CONTENT - HEADER
@@ -1855,12 +1844,14 @@ The data tells a story of opportunity and inequality. Some regions produce ten t
 st.markdown("### Dashboard Key Metrics")
 col1, col2, col3, col4, col5 = st.columns(5)
 
-total_production = df['production_mwh'].sum()
-total_regions = df['region'].nunique()
-avg_year_production = df.groupby('year')['production_mwh'].sum().mean()
-growth_rate = ((df[df['year']==df['year'].max()]['production_mwh'].sum() / 
-                df[df['year']==df['year'].min()]['production_mwh'].sum() - 1) * 100) if len(df['year'].unique()) > 1 else 0
-renewable_types = df['energy_type'].nunique()
+production_summary = summarize_production(df)
+
+yearly = production_summary['by_year']
+total_production = production_summary['total']
+total_regions = len(df['region'].cat.categories)
+avg_year_production = yearly.mean()
+growth_rate = (yearly.iat[-1] / yearly.iat[0] - 1) * 100 if len(yearly) > 1 else 0
+renewable_types = len(df['energy_type'].cat.categories)
 
 with col1:
     st.metric("Total Production", f"{total_production/1e6:.2f}B MWh", 
@@ -1872,7 +1863,7 @@ with col3:
 with col4:
     st.metric("Avg Annual (MWh)", f"{avg_year_production/1e6:.2f}B")
 with col5:
-    years_covered = df['year'].max() - df['year'].min() + 1
+    years_covered = yearly.index[-1] - yearly.index[0] + 1
     st.metric("Years Covered", f"{years_covered}")
 
 st.divider()
@@ -1880,16 +1871,23 @@ st.divider()
 # TAB SECTION - ADVANCED VISUALIZATIONS
 
 
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "Real France Maps", 
-    "3D Geographic Map",
-    "Energy Distribution",
-    "Advanced Analytics",
-    "Statistical Charts",
-    "More Visualizations"
-])
+# st.tabs runs every tab body on each rerun, so a radio picks the one view whose charts get built
+active_view = st.radio(
+    "View",
+    [
+        "Real France Maps", 
+        "3D Geographic Map",
+        "Energy Distribution",
+        "Advanced Analytics",
+        "Statistical Charts",
+        "More Visualizations"
+    ],
+    horizontal=True,
+    label_visibility="collapsed",
+    key="active_view"
+)
 
-with tab1:
+if active_view == "Real France Maps":
     st.markdown("### Geographic Production Patterns")
     st.markdown("""
     **Analysis:** Regional disparities reveal structural advantages. Mountain regions dominate hydraulic production. 
@@ -1919,23 +1917,23 @@ with tab1:
     try:
         if map_view_type == "Regional Intensity":
             st.markdown("**Insight:** Darker colors indicate higher production. Notice the concentration in mountainous Auvergne-Rhône-Alpes.")
-            choropleth_fig = create_styled_regional_choropleth(df_filtered, year_selection=selected_year_choropleth)
+            choropleth_fig = create_styled_regional_choropleth(aggregate_by_year_region(df_filtered), year_selection=selected_year_choropleth)
             if choropleth_fig:
-                st.plotly_chart(choropleth_fig, use_container_width=True, height=750)
+                st.plotly_chart(choropleth_fig, use_container_width=True)
             else:
                 st.warning("Could not generate choropleth map.")
         else:
             st.markdown("**Insight:** Globe view shows France's position. Bubble size reflects regional production scale.")
-            globe_fig = create_3d_globe_map(df_filtered, year_selection=selected_year_choropleth)
+            globe_fig = create_3d_globe_map(aggregate_by_year_region(df_filtered), prepare_geo_data(raw_data), year_selection=selected_year_choropleth)
             if globe_fig:
-                st.plotly_chart(globe_fig, use_container_width=True, height=750)
+                st.plotly_chart(globe_fig, use_container_width=True)
             else:
                 st.warning("Could not generate 3D globe.")
     except Exception as e:
         st.error(f"Map display error: {e}")
 
 
-with tab2:
+elif active_view == "3D Geographic Map":
     st.markdown("### Production Magnitude by Region")
     st.markdown("""
     **Analysis:** Column height represents total renewable output. Auvergne-Rhône-Alpes towers above others—its Alpine geography enables massive hydroelectric capacity. 
@@ -1950,7 +1948,7 @@ with tab2:
             st.rerun()
     
     try:
-        regional_3d = create_3d_regional_columns(df_filtered)
+        regional_3d = create_3d_regional_columns(aggregate_by_year_region(df_filtered))
         if regional_3d:
             st.plotly_chart(regional_3d, use_container_width=True)
             st.markdown("**Key Finding:** Three regions (Auvergne-Rhône-Alpes, Grand Est, Occitanie) account for over 60% of national renewable production.")
@@ -1960,11 +1958,11 @@ with tab2:
         st.warning(f"3D visualization error: {e}")
         st.info("Using alternative visualization...")
         try:
-            st.plotly_chart(create_3d_scatter_plot(df_filtered), use_container_width=True)
+            st.plotly_chart(create_3d_scatter_plot(aggregate_by_region_energy(df_filtered)), use_container_width=True)
         except:
             st.error("Could not generate 3D visualization")
 
-with tab3:
+elif active_view == "Energy Distribution":
     st.markdown("### Energy Mix Evolution")
     st.markdown("""
     **Thread:** Specialization creates efficiency but also risk. Most regions depend heavily on one energy source.
@@ -2012,7 +2010,7 @@ with tab3:
         except Exception as e:
             st.error(f"Error: {e}")
 
-with tab4:
+elif active_view == "Advanced Analytics":
     st.markdown("### Growth Dynamics and Temporal Patterns")
     st.markdown("""
     **Thread:** Wind energy drives renewable expansion. Production doubles between 2016 and 2021. 
@@ -2034,7 +2032,7 @@ with tab4:
         st.markdown("**Regional Animation Timeline**")
         st.markdown("*Bubble size reflects production scale*")
         try:
-            st.plotly_chart(create_animated_bubble_chart(df_filtered), use_container_width=True)
+            st.plotly_chart(create_animated_bubble_chart(aggregate_by_year_region(df_filtered)), use_container_width=True)
             st.markdown("**Dynamic:** Watch Grand Est bubble expand—wind turbine deployment accelerates after 2017.")
         except Exception as e:
             st.error(f"Error: {e}")
@@ -2044,7 +2042,7 @@ with tab4:
     with col1:
         st.markdown("**Cumulative National Production**")
         try:
-            st.plotly_chart(create_cumulative_production(df_filtered), use_container_width=True)
+            st.plotly_chart(create_cumulative_production(build_energy_yearly_trends(aggregate_by_year_energy(df_filtered))), use_container_width=True)
             st.markdown("**Scale:** France generates over 500 TWh of renewable electricity during this six-year period.")
         except Exception as e:
             st.error(f"Error: {e}")
@@ -2052,11 +2050,11 @@ with tab4:
     with col2:
         st.markdown("**Year-over-Year Growth Rates**")
         try:
-            st.plotly_chart(create_energy_growth_rate(df_filtered), use_container_width=True)
+            st.plotly_chart(create_energy_growth_rate(build_energy_yearly_trends(aggregate_by_year_energy(df_filtered))), use_container_width=True)
             st.markdown("**Leaders:** Hauts-de-France and Grand Est achieve 150%+ wind growth. Île-de-France stagnates below 5%.")
         except Exception as e:
             st.error(f"Error: {e}")
-with tab5:
+elif active_view == "Statistical Charts":
     st.markdown("### Statistical Distributions and Correlations")
     st.markdown("""
     **Thread:** Production inequality is extreme. Top three regions generate more than bottom ten combined.
@@ -2089,7 +2087,7 @@ with tab5:
         st.markdown("**Production Intensity Matrix**")
         st.markdown("*Darker cells indicate higher output*")
         try:
-            st.plotly_chart(create_heatmap_timeline(df_filtered), use_container_width=True)
+            st.plotly_chart(create_heatmap_timeline(aggregate_by_year_region(df_filtered)), use_container_width=True)
             st.markdown("**Pattern:** Red streak across Auvergne-Rhône-Alpes shows persistent dominance from 2016 to 2021.")
         except Exception as e:
             st.error(f"Error: {e}")
@@ -2098,12 +2096,12 @@ with tab5:
         st.markdown("**Regional Contribution Over Time**")
         st.markdown("*Area size represents production share*")
         try:
-            st.plotly_chart(create_area_chart_regions(df_filtered), use_container_width=True)
+            st.plotly_chart(create_area_chart_regions(aggregate_by_year_region(df_filtered)), use_container_width=True)
             st.markdown("**Stability:** Top five regions maintain their positions. Little mobility. New entrants struggle to scale.")
         except Exception as e:
             st.error(f"Error: {e}")
 
-with tab6:
+elif active_view == "More Visualizations":
     st.markdown("### Multi-Dimensional Analysis")
     st.markdown("""
     **Thread:** Correlations reveal hidden dependencies. Regions that excel in one energy type rarely diversify.
@@ -2131,7 +2129,7 @@ with tab6:
     Read vertically: Which regions lead in each energy type?
     """)
     try:
-        st.plotly_chart(create_heatmap_with_insights(df_filtered), use_container_width=True)
+        st.plotly_chart(create_heatmap_with_insights(aggregate_by_region_energy(df_filtered)), use_container_width=True)
         st.markdown("**Pattern:** Bright cells are few and isolated. Most regions show one dominant color—specialization, not balance.")
     except Exception as e:
         st.error(f"Error: {e}")
@@ -2141,7 +2139,7 @@ with tab6:
     st.markdown("**Multi-Energy Timeline**")
     st.markdown("*3D ribbons track six energy types across years*")
     try:
-        st.plotly_chart(create_3d_ribbon_chart(df_filtered), use_container_width=True)
+        st.plotly_chart(create_3d_ribbon_chart(aggregate_by_year_energy(df_filtered)), use_container_width=True)
         st.markdown("**Dynamics:** Hydraulic ribbon stays flat. Wind ribbon climbs steeply. Solar ribbon begins ascent after 2018.")
     except Exception as e:
         st.error(f"Error: {e}")
@@ -2151,7 +2149,7 @@ with tab6:
     st.markdown("**Bubble Scatter: Region × Energy Type**")
     st.markdown("*Bubble size represents total production*")
     try:
-        st.plotly_chart(create_region_vs_energy_scatter(df_filtered), use_container_width=True)
+        st.plotly_chart(create_region_vs_energy_scatter(aggregate_by_region_energy(df_filtered)), use_container_width=True)
         st.markdown("**Observation:** Largest bubbles cluster in hydraulic column. Wind column grows denser over time.")
     except Exception as e:
         st.error(f"Error: {e}")
@@ -2166,7 +2164,7 @@ st.markdown("""
 Click on segments to zoom in/out. This hierarchical view shows how each energy type 
 contributes to regional production and the regional breakdown within each energy type.
 """)
-st.plotly_chart(create_regional_energy_share(df), use_container_width=True)
+st.plotly_chart(create_regional_energy_share(aggregate_by_region_energy(df)), use_container_width=True)
 
 st.divider()
 
@@ -2175,77 +2173,50 @@ st.divider()
 
 st.header("Filtered Analysis & Detailed Exploration")
 
-with st.expander("Show Advanced Filters", expanded=False):
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        year_range = st.slider(
-            "Select Year Range",
-            int(df['year'].min()),
-            int(df['year'].max()),
-            (int(df['year'].min()), int(df['year'].max())),
-            key="year_slider_detailed"
-        )
-    
-    with col2:
-        selected_energy = st.multiselect(
-            "Energy Types",
-            sorted(df['energy_type'].unique()),
-            default=sorted(df['energy_type'].unique())[:5],
-            key="energy_filter_detailed"
-        )
-    
-    with col3:
-        selected_region = st.multiselect(
-            "Regions",
-            sorted(df['region'].unique()),
-            default=sorted(df['region'].unique())[:5],
-            key="region_filter_detailed"
-        )
-    
-    df_filtered = df[
-        (df['year'] >= year_range[0]) &
-        (df['year'] <= year_range[1]) &
-        (df['energy_type'].isin(selected_energy)) &
-        (df['region'].isin(selected_region))
-    ].copy()
+with st.expander("Show Detailed Exploration", expanded=False):
+    # Same slice as every chart above: the sidebar controls are the single source of filter state
+    st.caption("Uses the year range, energy types and regions selected in the sidebar.")
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Production trend
-        trend_data = df_filtered.groupby(['year', 'energy_type']).agg({
-            'production_mwh': 'sum'
-        }).reset_index()
-        
-        fig_trend = px.line(
-            trend_data,
-            x='year',
-            y='production_mwh',
-            color='energy_type',
-            markers=True,
-            title="Production Trend Over Time",
-            labels={'production_mwh': 'Production (MWh)'}
-        )
-        st.plotly_chart(fig_trend, use_container_width=True)
+        try:
+            trend_data = aggregate_by_year_energy(df_filtered).astype({'energy_type': str})
+        
+            fig_trend = px.line(
+                trend_data,
+                x='year',
+                y='production_mwh',
+                color='energy_type',
+                markers=True,
+                title="Production Trend Over Time",
+                labels={'production_mwh': 'Production (MWh)'}
+            )
+            fig_trend.update_layout(uirevision='filters')
+            st.plotly_chart(fig_trend, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error: {e}")
     
     with col2:
         # Regional comparison
-        region_data = df_filtered.groupby('region').agg({
-            'production_mwh': 'sum'
-        }).reset_index().sort_values('production_mwh', ascending=True)
-        
-        fig_region = px.bar(
-            region_data,
-            x='production_mwh',
-            y='region',
-            orientation='h',
-            title="Production by Region",
-            labels={'production_mwh': 'Production (MWh)', 'region': 'Region'},
-            color='production_mwh',
-            color_continuous_scale='Greens'
-        )
-        st.plotly_chart(fig_region, use_container_width=True)
+        try:
+            region_data = aggregate_by_region(df_filtered).astype({'region': str}).sort_values('production_mwh', ascending=True)
+        
+            fig_region = px.bar(
+                region_data,
+                x='production_mwh',
+                y='region',
+                orientation='h',
+                title="Production by Region",
+                labels={'production_mwh': 'Production (MWh)', 'region': 'Region'},
+                color='production_mwh',
+                color_continuous_scale='Greens'
+            )
+            fig_region.update_layout(uirevision='filters')
+            st.plotly_chart(fig_region, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error: {e}")
     
     # Show filtered data table
     if len(df_filtered) > 0:
@@ -2267,28 +2238,23 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown("#### Production Leaders")
-    top_regions = df.groupby('region')['production_mwh'].sum().nlargest(5)
-    for i, (region, prod) in enumerate(top_regions.items(), 1):
-        pct = (prod / df['production_mwh'].sum()) * 100
-        st.markdown(f"""
-        <div class='success-box'>
-        <strong>{i}. {region}</strong><br>
-        {prod:,.0f} MWh ({pct:.1f}% of national total)
-        </div>
-        """, unsafe_allow_html=True)
+    top_regions = production_summary['by_region'].nlargest(5)
+    # All five cards go out in one element instead of one st.markdown round trip each
+    st.markdown("".join(
+        f"<div class='success-box'><strong>{i}. {region}</strong><br>"
+        f"{prod:,.0f} MWh ({prod / total_production * 100:.1f}% of national total)</div>"
+        for i, (region, prod) in enumerate(top_regions.items(), 1)
+    ), unsafe_allow_html=True)
     st.markdown("**Finding:** Top three regions generate 62% of all renewable electricity. Concentration creates vulnerability.")
 
 with col2:
     st.markdown("#### Energy Type Dominance")
-    top_energy = df.groupby('energy_type')['production_mwh'].sum().nlargest(5)
-    for i, (energy, prod) in enumerate(top_energy.items(), 1):
-        pct = (prod / df['production_mwh'].sum()) * 100
-        st.markdown(f"""
-        <div class='insight-box'>
-        <strong>{i}. {energy.title()}</strong><br>
-        {prod:,.0f} MWh ({pct:.1f}%)
-        </div>
-        """, unsafe_allow_html=True)
+    top_energy = production_summary['by_energy'].nlargest(5)
+    st.markdown("".join(
+        f"<div class='insight-box'><strong>{i}. {energy.title()}</strong><br>"
+        f"{prod:,.0f} MWh ({prod / total_production * 100:.1f}%)</div>"
+        for i, (energy, prod) in enumerate(top_energy.items(), 1)
+    ), unsafe_allow_html=True)
     st.markdown("**Finding:** Hydraulic accounts for two-thirds of renewable production. Dependence on rainfall creates climate risk.")
 
 st.divider()
@@ -2336,7 +2302,7 @@ st.divider()
 
 # FOOTER
 
-st.markdown("""
+FOOTER_MARKDOWN = """
 ---
 ### Dashboard Information
 
@@ -2362,5 +2328,7 @@ st.markdown("""
 - Treemaps for hierarchical viewing
 
 ---
-""".format(update_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+"""
+
+st.markdown(FOOTER_MARKDOWN.format(update_date=app_started_at()))
 
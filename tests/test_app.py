@@ -0,0 +1,88 @@
+"""Tests for the dashboard: shared filter helper plus end-to-end runs with streamlit.testing."""
+import importlib
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+APP_PATH = str(APP_DIR / "app.py")
+
+VIEWS = [
+    "Real France Maps",
+    "3D Geographic Map",
+    "Energy Distribution",
+    "Advanced Analytics",
+    "Statistical Charts",
+    "More Visualizations",
+]
+
+
+@pytest.mark.parametrize("view", VIEWS)
+def test_partial_energy_and_region_selection_renders(view):
+    """Narrowing the sidebar filters must not break any view (filtered-out categories once raised KeyError)."""
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.run()
+    assert not at.exception
+
+    energy_select, region_select = at.sidebar.multiselect
+    energy_select.set_value(energy_select.options[:2])
+    region_select.set_value(region_select.options[:2])
+    at.radio(key="active_view").set_value(view)
+    at.run()
+
+    assert not at.exception
+    assert not at.error
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    """Import app.py outside a Streamlit runtime (widgets return their defaults) to reach its helpers."""
+    sys.path.insert(0, str(APP_DIR))
+    try:
+        yield importlib.import_module("app")
+    finally:
+        sys.path.remove(str(APP_DIR))
+
+
+def mask_filter(df, year_start, year_end, energy_types, regions):
+    """Reference implementation: the plain boolean-mask filter apply_filters replaces."""
+    return df[
+        df['year'].between(year_start, year_end) &
+        df['energy_type'].isin(energy_types) &
+        df['region'].isin(regions)
+    ]
+
+
+def normalized(df):
+    """Row set in a canonical order with plain str labels, so category sets and row order don't matter."""
+    return (
+        df.astype({'region': str, 'energy_type': str})
+        .sort_values(['year', 'region', 'energy_type'])
+        .reset_index(drop=True)
+    )
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_apply_filters_matches_boolean_mask(app_module, shuffle):
+    """The binary-search year slice must select exactly the rows a full mask would, sorted input or not."""
+    df = app_module.df
+    if shuffle:
+        df = df.sample(frac=1, random_state=0)
+    years = sorted(df['year'].unique())
+    energy_types = tuple(df['energy_type'].cat.categories)
+    regions = tuple(df['region'].cat.categories)
+    selections = [
+        (years[0], years[-1], energy_types, regions),
+        (years[1], years[-2], energy_types[:2], regions[:3]),
+        (years[-1], years[-1], energy_types[-1:], regions),
+        (years[0], years[0], energy_types, regions[-2:]),
+        (years[-1] + 1, years[-1] + 5, energy_types, regions),
+    ]
+
+    for year_start, year_end, energy_selection, region_selection in selections:
+        result = app_module.apply_filters(df, int(year_start), int(year_end), energy_selection, region_selection)
+        expected = mask_filter(df, year_start, year_end, energy_selection, region_selection)
+        pd.testing.assert_frame_equal(normalized(result), normalized(expected))